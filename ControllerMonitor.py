@@ -1,38 +1,72 @@
 from machine import ADC
+from math import exp
 from Timestamp import Timestamp
 
 class ControllerMonitor:
     levels_to_millivolts = ((0, 0), (100, 10000))
     unit = "%"
+    # Input RC filter (see DETAILS.md): 2.2 uF, 324k || (324k + 536k) = 235k.
+    rc_time_constant = 520
+    # Predicted change (mV) which means that the voltage is still settling.
+    transit_threshold = 100
+    # Shortest interval (ms) for the prediction. Extrapolation multiplies
+    # the ADC noise by about tau / dt, so extra updates in between are skipped.
+    prediction_min_interval = 150
     def _calculate_level(self, mv):
         return mv // 100
 
+    def _adc_to_millivolts(self, adc_u16):
+        # Voltage divider: GND, 324k, ADC, 324k, 536k, real_volts.
+        # 12-bit ADC max = 3.3 V / 0xfff0.
+        # Theoretical value:
+        #mv = adc_u16 * (324 * 2 + 536) / 324 * 3300 / 0xfff0
+        # Reality: Adjusted with multimeter measurements.
+        #mv = (adc_u16 - 145) * 0.181941
+        return max(0, (adc_u16 - 145) * 9831 // 54034)
+
     def __init__(self, pin):
         self.voltage_adc = ADC(pin)
         self.millivolts = None
+        self.predicted_millivolts = None
         self.measured_level = None
         self.level = None
         self.timestamp = Timestamp(None)
+        self._sample_timestamp = Timestamp(None)
+        self._predicted_level = None
 
     def update(self):
         # Take 16 samples to avoid ADC fluctuation. 12-bit ADC, max 0xfff0.
+        dt = self._sample_timestamp.ms()
+        if dt is not None and 0 <= dt < self.prediction_min_interval:
+            return
+
         adc_u16 = 0
         for i in range(16):
             adc_u16 += self.voltage_adc.read_u16()
         adc_u16 = adc_u16 >> 4
+        mv = self._adc_to_millivolts(adc_u16)
 
-        # Voltage divider: GND, 324k, ADC, 324k, 536k, real_volts.
-        # 12-bit ADC max = 3.3 V / 0xfff0.
-        # Theoretical value:
-        #mv = adc_u16 * (324 * 2 + 536) / 324 * 3300 / 0xfff0
-        # Reality: Adjusted with multimeter measurements.
-        #mv = (adc_u16 - 145) * 0.181941
-        mv = max(0, (adc_u16 - 145) * 9831 // 54034)
+        # The RC filter settles slowly. After a step in the input, the voltage
+        # approaches the settled value exponentially, so extrapolate from the
+        # last change: v_settled = v + dv / (exp(dt / tau) - 1).
+        self._sample_timestamp.reset()
+        predicted = mv
+        if dt and dt < 2_000 and self.millivolts is not None:
+            predicted = max(0, mv + int((mv - self.millivolts) / (exp(dt / self.rc_time_constant) - 1)))
 
         self.millivolts = mv
+        self.predicted_millivolts = predicted
 
         # Update timestamp when the manual control level changes.
         tmp = self._calculate_level(mv)
+        if abs(predicted - mv) >= self.transit_threshold:
+            # Still settling. Accept the predicted level when two predictions
+            # agree, and ignore the intermediate levels in any case.
+            p = self._calculate_level(predicted)
+            tmp = p if p == self._predicted_level else self.measured_level
+            self._predicted_level = p
+        else:
+            self._predicted_level = None
         if tmp != self.measured_level:
             self.measured_level = tmp
             self._level_changed()
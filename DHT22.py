@@ -52,6 +52,6 @@ class DHT22:
         # Also handle 0, 0 as error, the sensor says that in the beginning and it's not likely to actually happen.
         if new_rh or new_temp:
             self.humidity, self.temperature = new_rh, new_temp
-            self.timestamp = Timestamp()
+            self.timestamp.reset()
         elif not self.timestamp.between(0, 120_000):
             self.humidity = self.temperature = None
@@ -2,6 +2,9 @@ from machine import Pin, PWM
 from Timestamp import Timestamp
 from LinearInterpolator import LinearInterpolator
 
+# Duration of the start-up pulse for a stopped fan.
+FAN_KICK_DURATION = const(3_000)
+
 class FanController:
     def __init__(
         self, *,
@@ -22,13 +25,29 @@ class FanController:
         self.stable = False
         self.pwm_stable_threshold = 100
         self.target = 0
-        self.memory = LinearInterpolator(
+        # The effect of a given PWM is different when accelerating and
+        # when decelerating, so learn separate curves for both directions.
+        memory = lambda: LinearInterpolator(
             [(-1, -1), (max_effect + 1, 65536)],
             min_dx = max_effect // 50,
             min_dy = 500,
             max_points = 20,
         )
+        self.memory_rising = memory()
+        self.memory_falling = memory()
+        # A learned point is copied to the other curve if it has no point this near.
+        self.memory_near = max_effect // 10
+        self.rising = True
         self.memory_updated = False
+        # Start-up pulse: learned PWM and the latest time to start (ms).
+        self.start_pwm = 65535 // 4
+        self.start_ms = None
+        self.kick_timestamp = Timestamp(None)
+        self._kick_learn = True
+        # Don't go below a PWM where the fan has stalled, until target is 0.
+        self._min_pwm = 0
+        # The fan was running with our PWM on the previous update.
+        self._running = False
 
     def update(self, target, effect, effect_stable, effect_stable_threshold, stable_delay):
         self.switch_on = 1 - self.pin_switch_on() if self.pin_switch_on else 0
@@ -37,6 +56,16 @@ class FanController:
 
         if not self.pwm_output or not self.switch_on or not self.switch_own:
             self.changed_timestamp = Timestamp(None)
+            self.kick_timestamp = Timestamp(None)
+            self._min_pwm = 0
+            self._running = False
+            return
+
+        if not target:
+            self._min_pwm = 0
+        stalled = self._running and not effect
+        self._running = effect > 0
+        if self._kick(target, effect, stalled):
             return
 
         effect_wrong = abs(target - effect) > effect_stable_threshold
@@ -44,20 +73,81 @@ class FanController:
 
         if self.stable and not self.memory_updated:
             self.memory_updated = True
-            self.memory.add_point(effect, self.pwm, monotonic = True)
+            memory, other = self.memory_rising, self.memory_falling
+            if not self.rising:
+                memory, other = other, memory
+            memory.add_point(effect, self.pwm, monotonic = True)
+            # An untrained curve would jump back to its default line.
+            if all(abs(x - effect) > self.memory_near for x, _ in other.points[1:-1]):
+                other.add_point(effect, self.pwm, monotonic = True)
 
         if effect_wrong:
-            # Optimize PWM with linear interpolation.
-            new_pwm = max(0, min(65535, self.memory.value_at(target)))
-            # Put some extra effort into starting the fan.
-            if target and not effect:
-                new_pwm = max(new_pwm, self.pwm)
-                if self.stable:
-                    new_pwm = min(65535, max(new_pwm, self.pwm + self.pwm_stable_threshold, self.pwm * 2))
+            # Optimize PWM with linear interpolation, in the right direction.
+            rising = target > effect
+            memory = self.memory_rising if rising else self.memory_falling
+            new_pwm = max(0, min(65535, memory.value_at(target)))
+            if self.stable and abs(self.pwm - new_pwm) < self.pwm_stable_threshold and (effect, self.pwm) not in memory.points:
+                # The curve would keep the PWM although the effect is wrong,
+                # e.g. untrained after an overshoot. Teach it the current point.
+                memory.add_point(effect, self.pwm, monotonic = True)
+                new_pwm = max(0, min(65535, memory.value_at(target)))
+            if target:
+                new_pwm = max(new_pwm, self._min_pwm)
             # Avoid doing minimal changes to the PWM.
             if abs(self.pwm - new_pwm) >= self.pwm_stable_threshold:
-                self.pwm_output.duty_u16(new_pwm)
-                self.pwm = new_pwm
-                self.stable = False
-                self.changed_timestamp = Timestamp()
-                self.memory_updated = False
+                self._set_pwm(new_pwm, rising)
+
+    def snapshot(self):
+        return [self.pwm, self.start_pwm, list(self.memory_rising.points), list(self.memory_falling.points)]
+
+    def restore(self, snapshot):
+        pwm, self.start_pwm, rising, falling = snapshot
+        self.memory_rising.points = [(x, y) for x, y in rising]
+        self.memory_falling.points = [(x, y) for x, y in falling]
+        if self.pwm_output and pwm:
+            self._set_pwm(pwm, True)
+            # The fan may be running already, but the tachy has no reading
+            # yet. Wait for it like after a start-up pulse, without learning.
+            self.kick_timestamp = Timestamp()
+            self._kick_learn = False
+
+    def _set_pwm(self, new_pwm, rising):
+        # Learn the point in the same curve which is used to find the PWM.
+        self.rising = rising
+        self.pwm_output.duty_u16(new_pwm)
+        self.pwm = new_pwm
+        self.stable = False
+        self.changed_timestamp = Timestamp()
+        self.memory_updated = False
+
+    def _kick(self, target, effect, stalled):
+        """Start a stopped fan with a pulse, learn the start PWM. Return True while kicking."""
+        if self.kick_timestamp.between(0, None):
+            if effect:
+                if self._kick_learn:
+                    # Started. Try a little lower next time.
+                    self.start_ms = self.kick_timestamp.ms()
+                    self.start_pwm = max(self.pwm_stable_threshold, self.start_pwm - self.start_pwm // 16)
+            elif target and self.kick_timestamp.between(0, FAN_KICK_DURATION):
+                return True
+            elif target:
+                # Didn't start. Try harder right away.
+                if self._kick_learn:
+                    self.start_pwm = min(65535, self.start_pwm * 3 // 2)
+                self._start_kick()
+                return True
+            self.kick_timestamp = Timestamp(None)
+            return False
+
+        if target and not effect:
+            # If the fan was running and stopped, the PWM was too low.
+            if stalled:
+                self._min_pwm = min(65535, max(self._min_pwm, self.pwm + self.pwm // 8))
+            self._start_kick()
+            return True
+        return False
+
+    def _start_kick(self):
+        self._set_pwm(max(self.start_pwm, self.pwm), True)
+        self.kick_timestamp = Timestamp()
+        self._kick_learn = True
@@ -1,4 +1,5 @@
 from machine import Pin
+from time import ticks_ms, ticks_add, ticks_diff
 from rp2 import PIO, StateMachine, asm_pio
 from Timestamp import Timestamp
 
@@ -6,16 +7,20 @@ class TachyInputPIO:
     """PIO for counting tachy input.
     TX FIFO: None.
     RX FIFO: microseconds between falling edges.
-    PIO instructions: 6
+    IRQ: relative 0, after each value.
+    PIO instructions: 7
     """
 
     def __init__(self, sm, pin, timeout):
         self._timeout = timeout
         self._diff = -1
-        self._timestamp = Timestamp(None)
+        self._discard = 0
+        self._ticks = ticks_add(ticks_ms(), -timeout - 1)
         self.pin = Pin(pin, Pin.IN, Pin.PULL_UP)
         pio_freq = 2_000_000 # 2 cycles per usec.
         self.sm = StateMachine(sm, self.pio_program, freq = pio_freq, jmp_pin = self.pin)
+        # Soft IRQ handlers are run with micropython.schedule.
+        self.sm.irq(self._drain)
         self.sm.restart()
         self.sm.active(1)
 
@@ -27,6 +32,7 @@ class TachyInputPIO:
         label("x_nop1")
         jmp(pin, "loop_1")
         in_(x, 30)
+        irq(rel(0))
         set(x, 0)
         # Count until 1
         wrap_target()
@@ -35,20 +41,27 @@ class TachyInputPIO:
         label("x_nop0")
         jmp(pin, "loop_1")
 
-    def diff_us(self):
-        # If the FIFO is full and the PIO stalls, the second value will be bad,
-        # because it includes the stalling time. (The first value is just late.)
-        # => Always read two values and use only the first one.
+    def _drain(self, sm):
+        # If the FIFO is full and the PIO stalls, the value after the stalled
+        # one will be bad, because it includes the stalling time.
+        # => Discard the next two values. (The stalled value is just late.)
         # If the RPM drops to zero, the counter will overflow.
         # => Don't use the first value after timeout (RPM zero).
-        last_valid = self._timestamp.between(0, self._timeout)
-        while self.sm.rx_fifo() > 1:
+        t = ticks_ms()
+        n = self.sm.rx_fifo()
+        for i in range(n):
             diff = 0x3fffffff - self.sm.get()
-            self.sm.get()
-            self._timestamp = Timestamp()
-            if last_valid:
+            last_valid = ticks_diff(t, self._ticks) <= self._timeout
+            self._ticks = t
+            if self._discard:
+                self._discard -= 1
+            elif last_valid:
                 self._diff = diff
-        if not last_valid or self._diff > self._timeout * 1000:
+        if n >= 8:
+            self._discard = 2
+
+    def diff_us(self):
+        if ticks_diff(ticks_ms(), self._ticks) > self._timeout or self._diff > self._timeout * 1000:
             self._diff = -1
         return self._diff
 
@@ -1,4 +1,6 @@
+from array import array
 from machine import Pin
+from time import ticks_ms, ticks_diff
 from rp2 import PIO, StateMachine, asm_pio
 from Timestamp import Timestamp
 
@@ -17,22 +19,45 @@ class Hob2HoodReceiverPIO:
     """PIO for receiving Hob2Hood IR codes: 25 bits, simple on-off, 733 us/bit.
     TX FIFO: None.
     RX FIFO: 25-bit messages, with bits inverted.
-    PIO instructions: 5
+    IRQ: relative 0, after each message.
+    PIO instructions: 6
+
+    Messages are buffered with their arrival times (ticks_ms).
     """
 
     def __init__(self, sm, pin):
         if sm is None or pin is None:
             self.get = lambda: None
             return
+        self._messages = array("I", [0] * 8)
+        self._ticks = array("I", [0] * 8)
+        self._head = self._tail = 0
         pio_freq = 64_000_000 // 733 # 64 cycles to one bit.
         self.pin = Pin(pin, Pin.IN, pull = None)
         self.sm = StateMachine(sm, self.pio_program, freq = pio_freq, in_base = self.pin)
+        # Soft IRQ handlers are run with micropython.schedule.
+        self.sm.irq(self._drain)
         self.sm.restart()
         self.sm.active(1)
 
+    def _drain(self, sm):
+        t = ticks_ms()
+        while self.sm.rx_fifo():
+            i = self._head & 7
+            self._messages[i] = self.sm.get()
+            self._ticks[i] = t
+            self._head += 1
+
     def get(self):
+        """Return (message, ticks_ms) or None."""
+        # Drop the oldest messages if the buffer has overflown.
+        self._tail = max(self._tail, self._head - 8)
+        if self._tail == self._head:
+            return None
+        i = self._tail & 7
+        self._tail += 1
         # Invert bits and apply 25-bit mask.
-        return ~self.sm.get() & 0x1ffffff if self.sm.rx_fifo() else None
+        return ~self._messages[i] & 0x1ffffff, self._ticks[i]
 
     @asm_pio(fifo_join = PIO.JOIN_RX, autopush = True, push_thresh = 25)
     def pio_program():
@@ -45,6 +70,7 @@ class Hob2HoodReceiverPIO:
         label("next_bit")
         in_(pins, 1) .delay(31)
         jmp(x_dec, "next_bit") .delay(31)
+        irq(rel(0))
 
 class Hob2Hood:
     def __init__(self, *, receiver = None, sm = None, pin = None):
@@ -56,22 +82,26 @@ class Hob2Hood:
         self.light_timestamp = Timestamp(None)
 
     def update(self):
-        new_ir = self.receiver and self.receiver.get()
-        if new_ir in Hob2Hood_IR_codes:
+        while received := self.receiver and self.receiver.get():
+            new_ir, ticks = received
+            if new_ir not in Hob2Hood_IR_codes:
+                continue
             ir_code = Hob2Hood_IR_codes[new_ir]
+            # Timestamp from the arrival time.
+            age = ticks_diff(ticks_ms(), ticks)
 
             if ir_code == "L0" or ir_code == "L1":
-                self.light_timestamp = Timestamp()
+                self.light_timestamp = Timestamp(-age)
                 self.light = bool(ir_code == "L1")
                 if not self.light:
                     # Light is off, fan should be too. Play it safe.
                     self.expired_speed = None
                     self.speed = 0
-                    self.speed_timestamp = Timestamp()
+                    self.speed_timestamp = Timestamp(-age)
             else:
                 self.expired_speed = None
                 self.speed = ir_code
-                self.speed_timestamp = Timestamp()
+                self.speed_timestamp = Timestamp(-age)
 
         self.speed_timestamp.set_valid_between(0, 5_400_000)
         if self.speed and not self.speed_timestamp.valid():
@@ -1,5 +1,7 @@
+import gc
 import json
 import time
+from binascii import crc32
 from machine import Pin, WDT, mem32, unique_id
 from Timestamp import Timestamp
 from DHT22 import DHT22
@@ -8,6 +10,7 @@ from ControllerMonitor import *
 from FanMonitor import *
 from FanController import FanController
 from LinearInterpolator import LinearInterpolator
+from Schedule import Schedule
 
 def pin_make_vcc(num):
     """Set a pin high and set drive strength to 12 mA"""
@@ -19,6 +22,10 @@ def pin_make_vcc(num):
 def unique_id_str():
     return unique_id().hex().decode()
 
+def points_hash(points):
+    """Short hash of interpolator points: CRC-32 of "x0,y0,x1,y1,..." in hex."""
+    return "{:08x}".format(crc32(",".join(str(v) for xy in points for v in xy).encode()))
+
 class ExternalLogic:
     def __init__(self):
         self.set_interpolator_points([(0, 0), (100, 100)])
@@ -27,12 +34,19 @@ class ExternalLogic:
 
     def set_interpolator_points(self, points):
         self.interpolator = LinearInterpolator(points)
+        self.hash = points_hash(self.interpolator.points)
 
     def set_ttl(self, ttl):
         self.ttl = int(ttl)
         self.timestamp = Timestamp()
         self.timestamp.set_valid_between(0, self.ttl)
 
+    def keepalive(self, hash):
+        # Restart the TTL only if the peer knows the current points.
+        if hash != self.hash:
+            raise ValueError(hash)
+        self.set_ttl(self.ttl)
+
     def apply_to(self, value):
         if self.timestamp.valid():
             value = self.interpolator.value_at(value)
@@ -42,13 +56,14 @@ class CookingLogic:
     def __init__(self):
         self.value = 0
         self.cooking_started = False
+        self.cooking_ended = Timestamp(None)
 
     def update(self, cooking_assumed, value):
         if cooking_assumed:
             # Record cooking time and most recent fan value.
             if not self.cooking_started:
                 self.cooking_started = Timestamp()
-            self.cooking_ended = Timestamp()
+            self.cooking_ended.reset()
             self.cooking_duration = self.cooking_started.ms() - self.cooking_ended.ms()
             self.value = self.value_when_cooking = value
         else:
@@ -63,10 +78,45 @@ class CookingLogic:
     def apply_to(self, value):
         return max(value, self.value)
 
+HUMIDITY_WINDOW = const(5)
+
+class HumidityLogic:
+    """Detect a rapid rise in humidity or temperature (shower, cooking).
+
+    Readings are recorded once per minute, and the rise is measured
+    over the last HUMIDITY_WINDOW minutes.
+    """
+
+    def __init__(self):
+        self.rising = False
+        self._history = []
+        self._history_timestamp = Timestamp(None)
+
+    def update(self, humidity, temperature, rh_rise, temperature_rise):
+        if humidity is None or temperature is None:
+            self._history = []
+            self.rising = False
+            return
+        if not self._history_timestamp.between(0, 60_000):
+            self._history_timestamp = Timestamp()
+            self._history.append((humidity, temperature))
+            self._history = self._history[-HUMIDITY_WINDOW:]
+        rh_0, temperature_0 = self._history[0]
+        self.rising = bool(
+            (rh_rise and humidity - rh_0 >= rh_rise) or
+            (temperature_rise and temperature - temperature_0 >= temperature_rise)
+        )
+
 UDP_MAX_PEER_AGE = const(910_000)
 UDP_MAX_STATE_AGE = const(300_000)
 UDP_DEFAULT_PORT = const(38866)
 
+# Watchdog scratch registers 0-3 survive soft and watchdog resets.
+# (The SDK uses 4-7 for reboots.) Used for: magic, session, clock (s).
+WATCHDOG_SCRATCH = const(0x4005800c)
+SNAPSHOT_MAGIC = const(0x48564331)
+SNAPSHOT_INTERVAL = const(60_000)
+
 class HomeVentilationControl:
 
     _default_conf = {
@@ -74,20 +124,72 @@ class HomeVentilationControl:
         "modify_cm0": ((0, 0), (100, 100)),
         "modify_cm1": ((0, 0), (100, 100)),
         "modify_ir": ((0, 0), (4, 100)),
+        "schedule_0": [], # [[days, minute, points], ...], see Schedule.
+        "schedule_1": [],
+        "schedule_utc_offset": 0, # Minutes.
+        "boost_rh_rise": None, # 1/10 % RH in 5 minutes. None = disabled.
+        "boost_temperature_rise": None, # 1/10 °C in 5 minutes. None = disabled.
+        "boost_0": 50, # Fan speed during humidity boost.
+        "boost_1": 50,
         "udp_port": None, # None = null = disabled
     }
 
+    # State changes which are sent to UDP peers. Path, minimum change.
+    _relevant_changes_table = (
+        # Any changes in config.
+        (("conf",), None),
+        # 0.5 °C in temperature, 1 % changes in RH.
+        (("air", "temperature"), 0_5),
+        (("air", "rh"), 1_0),
+        (("air", "rising"), None),
+        # 2 percent changes in actual or target values.
+        (("0", "percentage"), 2),
+        (("1", "percentage"), 2),
+        (("0", "target_no_wifi"), 2),
+        (("1", "target_no_wifi"), 2),
+        (("0", "target"), 2),
+        (("1", "target"), 2),
+        # Any changes in physical switches.
+        (("0", "on"), None),
+        (("0", "own"), None),
+        (("1", "on"), None),
+        (("1", "own"), None),
+        # Any changes in WiFi controlled parameters.
+        (("0", "wifi", "points"), None),
+        (("0", "wifi", "valid"), None),
+        (("1", "wifi", "points"), None),
+        (("1", "wifi", "valid"), None),
+        # Any changes in scheduled parameters.
+        (("0", "schedule", "points"), None),
+        (("1", "schedule", "points"), None),
+        # Any level changes in controls.
+        (("0", "controller", "level"), None),
+        (("1", "controller", "level"), None),
+        (("1", "ir", "speed"), None),
+        (("1", "ir", "light"), None),
+    )
+
     def __init__(self):
+        # Heap used by each subsystem (bytes), see _budget().
+        self.memory_budget = {}
+        self._budget(None)
         pin_make_vcc(9)
         self.air = DHT22(10)
         self.ir = Hob2Hood(sm = 0, pin = 11)
         self.cooking_logic = CookingLogic()
+        self.humidity_logic = HumidityLogic()
+        # Humidity boost ramps down the same way as cooking.
+        self.boost_0 = CookingLogic()
+        self.boost_1 = CookingLogic()
+        self._budget("sensors")
 
         self.cm0 = VilpeECoIdeal(28)
         self.cm1 = LapetekVirgola5600XH(27)
+        self._budget("controller_monitors")
 
         self.fm0 = VilpeECoFlow125P700(sm = 1, pin = 16)
         self.fm1 = VilpeECoFlow125P700(sm = 2, pin = 26)
+        self._budget("fan_monitors")
 
         self._default_conf = dict(self._default_conf)
         self._default_conf.update({
@@ -107,6 +209,7 @@ class HomeVentilationControl:
             pin_pwm_out = 18,
             max_effect = 100,
         )
+        self._budget("fan_controllers")
         self.c0_target_no_wifi = 0
         self.c1_target_no_wifi = 0
         self.wifi_0 = ExternalLogic()
@@ -115,10 +218,38 @@ class HomeVentilationControl:
         self.modify_cm0 = LinearInterpolator(self.conf["modify_cm0"])
         self.modify_cm1 = LinearInterpolator(self.conf["modify_cm1"])
         self.modify_ir = LinearInterpolator(self.conf["modify_ir"])
+        self.schedule_0, self.schedule_1 = self._make_schedules(self.conf)
         self.watchdog = None
         self.udp_socket = None
         self.uptime = Timestamp()
+        # Processing times (us) and the interval between updates (ms).
+        self.updated = Timestamp(None)
+        self.update_us = self.udp_us = 0
+        self.update_interval = None
+        self.update_alloc = None
+        self._budget("conf_and_logic")
+        self._start_warm_clock()
+        self._restore_snapshot()
+        self._budget("snapshot")
         self.update()
+        self._budget("first_update")
+
+    def _budget(self, name):
+        # Record heap allocated since the previous call.
+        gc.collect()
+        alloc = gc.mem_alloc()
+        if name:
+            self.memory_budget[name] = alloc - self._budget_alloc
+        self._budget_alloc = alloc
+
+    def memory(self):
+        gc.collect()
+        return {
+            "budget": self.memory_budget,
+            "alloc": gc.mem_alloc(),
+            "free": gc.mem_free(),
+            "update_alloc": self.update_alloc,
+        }
 
     def _load_conf(self):
         conf = dict(self._default_conf)
@@ -135,8 +266,106 @@ class HomeVentilationControl:
             with open("HomeVentilationControl.conf", "w") as f:
                 json.dump(self.conf, f)
 
+    # Runtime state is saved in a snapshot file and restored after a reset.
+    # Times are stored on a "warm clock" which continues over soft resets.
+    # A power loss clears the session in the scratch registers,
+    # and then the snapshot is considered stale.
+    def _start_warm_clock(self):
+        if mem32[WATCHDOG_SCRATCH] == SNAPSHOT_MAGIC:
+            self._session = mem32[WATCHDOG_SCRATCH + 4]
+            # ticks_ms continues over a soft reset but restarts from 0
+            # after a hard or watchdog reset.
+            now = time.ticks_ms()
+            elapsed = time.ticks_diff(now, mem32[WATCHDOG_SCRATCH + 12])
+            if not 0 <= elapsed <= now:
+                elapsed = now
+            self._warm_clock_0 = mem32[WATCHDOG_SCRATCH + 8] * 1000 + elapsed
+        else:
+            import random
+            self._session = random.getrandbits(30)
+            self._warm_clock_0 = 0
+            mem32[WATCHDOG_SCRATCH] = SNAPSHOT_MAGIC
+            mem32[WATCHDOG_SCRATCH + 4] = self._session
+        self._snapshot = None
+        self._snapshot_timestamp = Timestamp()
+
+    def _warm_clock_ms(self):
+        return self._warm_clock_0 + self.uptime.ms()
+
+    def _snapshot_time(self, t):
+        # Timestamp to warm clock seconds.
+        return None if t.empty else (self._warm_clock_ms() - t.ms()) // 1000
+
+    def _restore_time(self, t):
+        return Timestamp(None) if t is None else Timestamp(t * 1000 - self._warm_clock_ms())
+
+    def _make_snapshot(self):
+        t = self._snapshot_time
+        cooking = lambda l: l.value and [l.value, l.value_when_cooking, l.cooking_duration, t(l.cooking_ended), t(l.cooking_started) if l.cooking_started else None]
+        wifi = lambda w: w.timestamp.valid() and [w.interpolator.points, w.ttl, t(w.timestamp)]
+        return {
+            "session": self._session,
+            "ir": [self.ir.speed, self.ir.expired_speed, self.ir.light, t(self.ir.speed_timestamp), t(self.ir.light_timestamp)],
+            "cooking_logic": cooking(self.cooking_logic),
+            "boost_0": cooking(self.boost_0),
+            "boost_1": cooking(self.boost_1),
+            "wifi_0": wifi(self.wifi_0),
+            "wifi_1": wifi(self.wifi_1),
+            "c0": self.c0.snapshot(),
+            "c1": self.c1.snapshot(),
+        }
+
+    def _save_snapshot(self):
+        mem32[WATCHDOG_SCRATCH + 8] = self._warm_clock_ms() // 1000
+        mem32[WATCHDOG_SCRATCH + 12] = time.ticks_ms()
+        if self._snapshot_timestamp.between(0, SNAPSHOT_INTERVAL):
+            return
+        self._snapshot_timestamp = Timestamp()
+        snapshot = self._make_snapshot()
+        if snapshot != self._snapshot:
+            with open("HomeVentilationControl.state", "w") as f:
+                json.dump(snapshot, f)
+            self._snapshot = snapshot
+
+    def _restore_snapshot(self):
+        try:
+            with open("HomeVentilationControl.state", "r") as f:
+                snapshot = json.load(f)
+            if snapshot["session"] != self._session:
+                return
+            t = self._restore_time
+            ir = self.ir
+            ir.speed, ir.expired_speed, ir.light, speed_time, light_time = snapshot["ir"]
+            ir.speed_timestamp, ir.light_timestamp = t(speed_time), t(light_time)
+            for what in ("cooking_logic", "boost_0", "boost_1"):
+                if s := snapshot[what]:
+                    l = getattr(self, what)
+                    l.value, l.value_when_cooking, l.cooking_duration, ended, started = s
+                    l.cooking_ended = t(ended)
+                    l.cooking_started = started is not None and t(started)
+            for what in ("wifi_0", "wifi_1"):
+                if s := snapshot[what]:
+                    w = getattr(self, what)
+                    points, ttl, timestamp = s
+                    w.set_interpolator_points(points)
+                    w.set_ttl(ttl)
+                    w.timestamp = t(timestamp)
+                    w.timestamp.set_valid_between(0, w.ttl)
+            self.c0.restore(snapshot["c0"])
+            self.c1.restore(snapshot["c1"])
+            self._snapshot = snapshot
+        except:
+            pass
+
+    def _make_schedules(self, conf):
+        offset = conf["schedule_utc_offset"]
+        return Schedule(conf["schedule_0"], offset), Schedule(conf["schedule_1"], offset)
+
     def update(self):
-        self.updated = Timestamp()
+        t = time.ticks_us()
+        alloc = gc.mem_alloc()
+        self.update_interval = self.updated.ms()
+        self.updated.reset()
         self.uptime.update()
         self.air.update()
         self.ir.update()
@@ -144,21 +373,29 @@ class HomeVentilationControl:
         self.cm1.update()
         self.fm0.update()
         self.fm1.update()
+        self.schedule_0.update()
+        self.schedule_1.update()
 
         ir_value = self.modify_ir.value_at(self.ir.speed)
         c0_value = self.modify_cm0.value_at(self.cm0.level)
         c1_value = self.modify_cm1.value_at(self.cm1.level)
 
         self.cooking_logic.update(self.ir.speed > 0, ir_value)
+        self.humidity_logic.update(self.air.humidity, self.air.temperature, self.conf["boost_rh_rise"], self.conf["boost_temperature_rise"])
+        self.boost_0.update(self.humidity_logic.rising, self.conf["boost_0"])
+        self.boost_1.update(self.humidity_logic.rising, self.conf["boost_1"])
 
+        c0_value = self.boost_0.apply_to(c0_value)
         self.c0_target_no_wifi = c0_value
-        c0_value = self.wifi_0.apply_to(c0_value)
+        # Wi-Fi overrides the schedule while valid.
+        c0_value = (self.wifi_0 if self.wifi_0.timestamp.valid() else self.schedule_0).apply_to(c0_value)
         self.c0.update(c0_value, self.fm0.percentage, self.fm0.stable, self.fm0.percentage_stable_threshold, self.fm0.stable_delay)
 
         c1_value = max(c1_value, ir_value)
         c1_value = self.cooking_logic.apply_to(c1_value)
+        c1_value = self.boost_1.apply_to(c1_value)
         self.c1_target_no_wifi = c1_value
-        c1_value = self.wifi_1.apply_to(c1_value)
+        c1_value = (self.wifi_1 if self.wifi_1.timestamp.valid() else self.schedule_1).apply_to(c1_value)
         self.c1.update(c1_value, self.fm1.percentage, self.fm1.stable, self.fm1.percentage_stable_threshold, self.fm1.stable_delay)
 
         try:
@@ -167,6 +404,14 @@ class HomeVentilationControl:
             self.watchdog.feed()
         except:
             pass
+        try:
+            self._save_snapshot()
+        except:
+            pass
+        self.update_us = time.ticks_diff(time.ticks_us(), t)
+        # Heap allocated per update, unless garbage was collected meanwhile.
+        alloc = gc.mem_alloc() - alloc
+        self.update_alloc = alloc if alloc >= 0 else None
 
     # Web interface is implemented as a module for WebMain.
     # See https://github.com/Metabolix/MicroPython-WebMain
@@ -188,6 +433,9 @@ class HomeVentilationControl:
         if method == "GET" and query == "?json":
             return request.reply(mime = "application/json", content = json.dumps(self.state()))
 
+        if method == "GET" and query == "?mem":
+            return request.reply(mime = "application/json", content = json.dumps(self.memory()))
+
         if method == "POST" and query == "?json-post":
             try:
                 self._handle_post(json.loads(request.read_body(4096)))
@@ -206,6 +454,19 @@ class HomeVentilationControl:
                 w.set_ttl(0)
                 w.set_interpolator_points(params)
                 w.set_ttl(obj[what + "_ttl"])
+            elif what in ("wifi_0_keepalive", "wifi_1_keepalive"):
+                getattr(self, what[:6]).keepalive(params)
+            elif what in ("schedule_0", "schedule_1", "schedule_utc_offset"):
+                conf = dict(self.conf)
+                conf[what] = params
+                self.schedule_0, self.schedule_1 = self._make_schedules(conf)
+                self.conf = conf
+            elif what in ("boost_rh_rise", "boost_temperature_rise"):
+                self.conf[what] = None if params is None else int(params)
+            elif what in ("boost_0", "boost_1"):
+                if not 0 <= int(params) <= 100:
+                    raise ValueError(what)
+                self.conf[what] = int(params)
             elif what == "save_conf" and params == [1]:
                 self._save_conf()
 
@@ -218,27 +479,46 @@ class HomeVentilationControl:
             "clock": clock,
             "uptime": self.uptime.ms(),
             "conf": self.conf,
+            "loop": {
+                "update_us": self.update_us,
+                "update_interval": self.update_interval,
+                "udp_us": self.udp_us,
+                "update_alloc": self.update_alloc,
+                "udp_peers": len(self._udp_peers) if self.udp_socket else 0,
+                "udp_received": self._udp_received if self.udp_socket else 0,
+            },
             "air": {
                 "temperature": self.air.temperature,
                 "rh": self.air.humidity,
+                "rising": self.humidity_logic.rising,
             },
             "0": {
                 "percentage": self.fm0.percentage,
                 "rpm": self.fm0.rpm,
                 "target_no_wifi": self.c0_target_no_wifi,
+                "boost": self.boost_0.value,
                 "target": c0.target,
                 "on": c0.switch_on,
                 "own": c0.switch_own,
+                "start_pwm": c0.start_pwm,
+                "start_ms": c0.start_ms,
                 "wifi": {
                     "points": self.wifi_0.interpolator.points,
+                    "hash": self.wifi_0.hash,
                     "valid": self.wifi_0.timestamp.valid(),
                     "age": self.wifi_0.timestamp.ms(),
                     "ttl": self.wifi_0.ttl,
                 },
+                "schedule": {
+                    "points": self.schedule_0.interpolator and self.schedule_0.interpolator.points,
+                    "active": self.schedule_0.active(),
+                    "seconds_left": self.schedule_0.seconds_left(),
+                },
                 "controller": {
                     "level": cm0.level,
                     "unit": cm0.unit,
                     "millivolts": cm0.millivolts,
+                    "predicted_millivolts": cm0.predicted_millivolts,
                     "age": cm0.timestamp.ms(),
                     "measured_level": cm0.measured_level,
                 },
@@ -247,19 +527,29 @@ class HomeVentilationControl:
                 "percentage": self.fm1.percentage,
                 "rpm": self.fm1.rpm,
                 "target_no_wifi": self.c1_target_no_wifi,
+                "boost": self.boost_1.value,
                 "target": c1.target,
                 "on": c1.switch_on,
                 "own": c1.switch_own,
+                "start_pwm": c1.start_pwm,
+                "start_ms": c1.start_ms,
                 "wifi": {
                     "points": self.wifi_1.interpolator.points,
+                    "hash": self.wifi_1.hash,
                     "valid": self.wifi_1.timestamp.valid(),
                     "age": self.wifi_1.timestamp.ms(),
                     "ttl": self.wifi_1.ttl,
                 },
+                "schedule": {
+                    "points": self.schedule_1.interpolator and self.schedule_1.interpolator.points,
+                    "active": self.schedule_1.active(),
+                    "seconds_left": self.schedule_1.seconds_left(),
+                },
                 "controller": {
                     "level": cm1.level,
                     "unit": cm1.unit,
                     "millivolts": cm1.millivolts,
+                    "predicted_millivolts": cm1.predicted_millivolts,
                     "age": cm1.timestamp.ms(),
                     "measured_level": cm1.measured_level,
                 },
@@ -274,10 +564,12 @@ class HomeVentilationControl:
         }
 
     def handle_udp(self):
+        t = time.ticks_us()
         try:
             self._handle_udp_unsafe()
         except:
             pass
+        self.udp_us = time.ticks_diff(time.ticks_us(), t)
 
     def _handle_udp_unsafe(self):
         # Create socket.
@@ -289,6 +581,7 @@ class HomeVentilationControl:
                 port = UDP_DEFAULT_PORT
             self._udp_peers = dict()
             self._udp_peer_state = None
+            self._udp_received = 0
             import socket
             s = self.udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
             s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
@@ -302,6 +595,7 @@ class HomeVentilationControl:
                 data, source = s.recvfrom(512)
             except:
                 break
+            self._udp_received += 1
             try:
                 # TODO: decrypt
                 obj = json.loads(data)
@@ -311,15 +605,19 @@ class HomeVentilationControl:
                     if post.pop("unique_id") != unique_id_str():
                         continue
                 self._handle_post(post)
-                if post or source not in self._udp_peers:
+                if any(not what.endswith("_keepalive") for what in post) or source not in self._udp_peers:
                     # Invalidate old state if a new peer connects or a command is posted.
+                    # Keepalive alone doesn't change anything worth sending.
                     self._udp_peer_state = None
-                self._udp_peers[source] = Timestamp()
+                if source in self._udp_peers:
+                    self._udp_peers[source].reset()
+                else:
+                    self._udp_peers[source] = Timestamp()
             except:
                 continue
 
         # Update after a command, mostly to apply the new targets.
-        if not self._udp_peer_state:
+        if self._udp_peers and not self._udp_peer_state:
             self.update()
 
         # Remove inactive peers.
@@ -329,9 +627,11 @@ class HomeVentilationControl:
             if not t.valid():
                 del self._udp_peers[peer]
 
-        # Send state if changed.
+        # Send state if changed. Don't even build it without peers.
+        if not self._udp_peers:
+            return
         s0, s1 = self._udp_peer_state, self.state()
-        if self._udp_peers and not s0 or self._relevant_changes(s0, s1, UDP_MAX_STATE_AGE):
+        if not s0 or self._relevant_changes(s0, s1, UDP_MAX_STATE_AGE):
             self._udp_peer_state = s1
             data = json.dumps({"HomeVentilationControl": s1})
             # TODO: encrypt
@@ -342,38 +642,10 @@ class HomeVentilationControl:
                     pass
 
     def _relevant_changes(self, s0, s1, interval):
-        relevant_changes = [
-            # Any changes in config.
-            (("conf",), None),
-            # Elapsed time since last update.
-            (("uptime",), interval),
-            # 0.5 °C in temperature, 1 % changes in RH.
-            (("air", "temperature"), 0_5),
-            (("air", "rh"), 1_0),
-            # 2 percent changes in actual or target values.
-            (("0", "percentage"), 2),
-            (("1", "percentage"), 2),
-            (("0", "target_no_wifi"), 2),
-            (("1", "target_no_wifi"), 2),
-            (("0", "target"), 2),
-            (("1", "target"), 2),
-            # Any changes in physical switches.
-            (("0", "on"), None),
-            (("0", "own"), None),
-            (("1", "on"), None),
-            (("1", "own"), None),
-            # Any changes in WiFi controlled parameters.
-            (("0", "wifi", "points"), None),
-            (("0", "wifi", "valid"), None),
-            (("1", "wifi", "points"), None),
-            (("1", "wifi", "valid"), None),
-            # Any level changes in controls.
-            (("0", "controller", "level"), None),
-            (("1", "controller", "level"), None),
-            (("1", "ir", "speed"), None),
-            (("1", "ir", "light"), None),
-        ]
-        for path, amount in relevant_changes:
+        # Elapsed time since last update.
+        if abs(s0["uptime"] - s1["uptime"]) >= interval:
+            return True
+        for path, amount in self._relevant_changes_table:
             p0, p1 = s0, s1
             for key in path:
                 p0 = p0[key]
@@ -387,26 +659,31 @@ class HomeVentilationControl:
         str_temp_rh = lambda x: x is None and "None" or f"{x // 10}.{x % 10}"
         str_fixed = lambda x: f"level fixed from {x.measured_level} {x.unit}, age {x.timestamp}" if x.level != x.measured_level else "level valid"
         str_wifi = lambda x: f"{len(x.interpolator.points)} data points, ttl {Timestamp.timestr(x.ttl)}, age {x.timestamp}"
-        str_output = lambda c: f"{c.target:3} %, on {c.switch_on:1}, own {c.switch_own:1}, {'stable' if c.stable else 'adjusting'}"
+        str_schedule = lambda x: f"{len(x.interpolator.points)} data points, {Timestamp.timestr(1000 * x.seconds_left())} left" if x.active() else "inactive"
+        str_output = lambda c: f"{c.target:3} %, on {c.switch_on:1}, own {c.switch_own:1}, {'starting' if c.kick_timestamp.between(0, None) else 'stable' if c.stable else 'adjusting'}"
         str_ctrl = lambda cm, fm: f"{fm.millivolts_to_percentage(cm.millivolts):3} %, from {cm.millivolts:5} mV = {cm.level} {cm.unit}, {str_fixed(cm)}"
         clock = "{0:04}-{1:02}-{2:02}T{3:02}:{4:02}:{5:02}Z".format(*time.gmtime())
         return f"""{self.__class__.__name__}
 uptime: {self.uptime}
 clock: {clock}
-air: {str_temp_rh(self.air.temperature)} °C, RH {str_temp_rh(self.air.humidity)} %
+air: {str_temp_rh(self.air.temperature)} °C, RH {str_temp_rh(self.air.humidity)} %{", rising" if self.humidity_logic.rising else ""}
 
 FAN 0 (main):
     Fan Monitor:  {self.fm0.percentage:3} % = {self.fm0.rpm:4} rpm
     Output:       {str_output(self.c0)}
     Ctrl Monitor: {str_ctrl(self.cm0, self.fm0)}
+    Boost:        {self.boost_0.value:3} %
     WiFi: {str_wifi(self.wifi_0)}
+    Schedule: {str_schedule(self.schedule_0)}
 
 FAN 1 (kitchen hood):
     Fan Monitor:  {self.fm1.percentage:3} % = {self.fm1.rpm:4} rpm
     Output:       {str_output(self.c1)}
     Ctrl Monitor: {str_ctrl(self.cm1, self.fm1)}
     Hob2Hood:     {self.cooking_logic.value:3} %, level {self.ir.speed}, age {self.ir.speed_timestamp}
+    Boost:        {self.boost_1.value:3} %
     WiFi: {str_wifi(self.wifi_1)}
+    Schedule: {str_schedule(self.schedule_1)}
 
 """
 
@@ -5,6 +5,9 @@ class LinearInterpolator:
         self.min_dx = min_dx
         self.min_dy = min_dy
         self.max_points = max_points
+        # Insertion order of added points (x -> serial), for eviction.
+        self._serial = 0
+        self._ages = {}
 
     def add_point(self, x, y, monotonic):
         # Always preserve end points.
@@ -14,10 +17,28 @@ class LinearInterpolator:
         for i in reversed(range(1, len(self.points) - 1)):
             x0, y0 = self.points[i]
             if (monotonic and (x < x0) != (y < y0)) or abs(x - x0) < self.min_dx or abs(y - y0) < self.min_dy:
+                self._ages.pop(x0, None)
                 self.points.pop(i)
-        if len(self.points) < self.max_points:
-            self.points.append((x, y))
-            self.points.sort()
+        if len(self.points) >= self.max_points and not self._evict():
+            return
+        self._serial += 1
+        self._ages[x] = self._serial
+        self.points.append((x, y))
+        self.points.sort()
+
+    def _evict(self):
+        # Remove a point which the neighbours already predict within min_dy,
+        # or if there are none, the oldest point. Preserve end points.
+        candidates = range(1, len(self.points) - 1)
+        if not candidates:
+            return False
+        def error(i):
+            (x0, y0), (x, y), (x1, y1) = self.points[i - 1 : i + 2]
+            return abs(y0 + (y1 - y0) * (x - x0) // (x1 - x0) - y)
+        redundant = [i for i in candidates if error(i) < self.min_dy]
+        i = min(redundant or candidates, key = lambda i: self._ages.get(self.points[i][0], 0))
+        self._ages.pop(self.points.pop(i)[0], None)
+        return True
 
     def value_at(self, x):
         i0, i1 = 0, len(self.points) - 1
@@ -0,0 +1,65 @@
+from time import time, gmtime
+from LinearInterpolator import LinearInterpolator
+
+# The clock starts from 2021-01-01 until it's set over the network.
+SCHEDULE_MIN_YEAR = const(2024)
+MINUTES_PER_WEEK = const(10080)
+
+class Schedule:
+    """Weekly schedule of interpolator curves, evaluated with the clock.
+
+    Entries are [days, minute, points]:
+    days = bit mask of weekdays, 1 = Monday, 2 = Tuesday, ..., 64 = Sunday,
+    minute = start time in minutes after midnight (local time),
+    points = interpolator points, or None to leave the value unmodified.
+    Each entry stays in force until the next entry starts.
+
+    The next transition time is precomputed, so update() is cheap.
+    """
+
+    def __init__(self, entries = (), utc_offset = 0):
+        self.utc_offset = int(utc_offset)
+        transitions = []
+        for days, minute, points in entries:
+            interpolator = LinearInterpolator(points) if points else None
+            for day in range(7):
+                if days >> day & 1:
+                    transitions.append(((day * 1440 + int(minute) - self.utc_offset) % MINUTES_PER_WEEK, interpolator))
+        transitions.sort(key = lambda t: t[0])
+        self._transitions = transitions
+        self.interpolator = None
+        self._since = self._until = 0
+
+    def update(self):
+        # Also notice if the clock is set backwards.
+        t = time()
+        if self._since <= t < self._until:
+            return
+        self.interpolator = None
+        self._since, self._until = t, t + 60
+        tm = gmtime(t)
+        if not self._transitions or tm[0] < SCHEDULE_MIN_YEAR:
+            return
+
+        # Find the latest transition (maybe from last week) and the next one.
+        now = tm[6] * 1440 + tm[3] * 60 + tm[4]
+        current = self._transitions[-1]
+        next_minute = self._transitions[0][0] + MINUTES_PER_WEEK
+        for transition in self._transitions:
+            if transition[0] > now:
+                next_minute = transition[0]
+                break
+            current = transition
+        self.interpolator = current[1]
+        self._until = t - tm[5] + (next_minute - now) * 60
+
+    def active(self):
+        return self.interpolator is not None
+
+    def seconds_left(self):
+        return self._until - time()
+
+    def apply_to(self, value):
+        if self.interpolator:
+            value = self.interpolator.value_at(value)
+        return value
@@ -7,9 +7,13 @@ class Timestamp:
     Create x = Timestamp(10_000), check x.passed().
     Create x = Timestamp(), set x.set_valid_between(0, 60_000), check x.valid().
     Create x = Timestamp(), read x.ms().
+    Reuse x with x.reset() in frequent updates to avoid heap allocation.
     """
 
     def __init__(self, offset = 0):
+        self.reset(offset)
+
+    def reset(self, offset = 0):
         self.empty = offset is None
         self._valid_ms_0 = self._valid_ms_1 = None
         if not self.empty:
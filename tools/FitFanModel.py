@@ -0,0 +1,234 @@
+# Fit fan and controller model constants from recorded samples (CPython 3.8+).
+#
+#   python3 FitFanModel.py samples.csv --fan MyFan --controller MyController > MyModels.py
+#
+# The CSV file has a header row and any of these columns:
+#   time_ms     sample time, for stable_delay (optional)
+#   pwm         PWM output, to detect changes (optional)
+#   millivolts  control voltage, measured with a multimeter
+#   rpm         fan speed
+#   adc         averaged ADC reading (read_u16) of the controller input
+#   level       controller setting (optional)
+# Empty cells are allowed. Each fit uses the rows which have its columns.
+#
+# Tip: With the switch set to the original controller, the controller drives
+# the fan, so one recording gives the ADC, voltage and RPM at the same time.
+
+import argparse
+import csv
+import math
+import sys
+
+COLUMNS = ("time_ms", "pwm", "millivolts", "rpm", "adc", "level")
+# Defaults from the FanMonitor base class, for values which can't be fitted.
+FAN_DEFAULTS = {"stable_delay": 1_000, "rpm_stable_threshold": 50}
+
+def read_samples(path):
+    samples = []
+    with open(path, newline = "") as f:
+        for row in csv.DictReader(f):
+            samples.append({c: float(row[c]) if row.get(c, "").strip() else None for c in COLUMNS})
+    return samples
+
+def rows(samples, *columns):
+    return [s for s in samples if all(s[c] is not None for c in columns)]
+
+def median(values):
+    values = sorted(values)
+    n = len(values)
+    return (values[(n - 1) // 2] + values[n // 2]) / 2
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, len(values) * p // 100)]
+
+def least_squares(xs, ys):
+    """Fit y = a * x + b, return (a, b, rms)."""
+    n = len(xs)
+    sx, sy = sum(xs), sum(ys)
+    sxx = sum(x * x for x in xs)
+    sxy = sum(x * y for x, y in zip(xs, ys))
+    a = (n * sxy - sx * sy) / (n * sxx - sx * sx)
+    b = (sy - a * sx) / n
+    return a, b, rms(xs, ys, a, b)
+
+def least_squares_origin(xs, ys):
+    """Fit y = a * x, return (a, rms)."""
+    a = sum(x * y for x, y in zip(xs, ys)) / sum(x * x for x in xs)
+    return a, rms(xs, ys, a, 0)
+
+def rms(xs, ys, a, b):
+    return math.sqrt(sum((a * x + b - y) ** 2 for x, y in zip(xs, ys)) / len(xs))
+
+def fit_adc(samples):
+    """Fit millivolts = (adc - offset) * num // den."""
+    data = rows(samples, "adc", "millivolts")
+    if len(data) < 2:
+        return None
+    if len(set(s["adc"] for s in data)) < 2:
+        raise ValueError("All adc values are equal. Record more than one voltage.")
+    a, b, error = least_squares([s["adc"] for s in data], [s["millivolts"] for s in data])
+    if a <= 0:
+        raise ValueError("Millivolts don't rise with adc. Check the columns.")
+    den = 1 << 16
+    return {"offset": round(-b / a), "num": round(a * den), "den": den, "samples": len(data), "rms_mv": error}
+
+def fit_fan(samples, rpm_stable_threshold):
+    """Fit FanMonitor constants: rpm = max_rpm * mv // millivolts_for_max_rpm."""
+    # Use only settled samples, if the time is known.
+    stable_delay = fit_stable_delay(samples, rpm_stable_threshold)
+    if stable_delay:
+        samples = [s for segment in segments(samples) for s in segment if s["time_ms"] - segment[0]["time_ms"] >= stable_delay]
+    data = rows(samples, "millivolts", "rpm")
+    running = [s for s in data if s["rpm"] > 0]
+    if len(running) < 2:
+        return None
+
+    # The fan saturates at max_rpm. Fit the line below saturation.
+    top = max(s["rpm"] for s in running)
+    max_rpm = median([s["rpm"] for s in running if s["rpm"] >= 0.97 * top])
+    linear = [s for s in running if s["rpm"] < 0.95 * max_rpm and s["millivolts"] > 0]
+    if not linear:
+        raise ValueError("All samples are near the maximum speed. Record lower speeds too.")
+    k, error = least_squares_origin([s["millivolts"] for s in linear], [s["rpm"] for s in linear])
+
+    # The fan isn't reliable at speeds where it has been seen stopped.
+    stopped = [k * s["millivolts"] for s in data if s["rpm"] == 0 and s["millivolts"] > 0]
+    stop_rpm = max([min(s["rpm"] for s in running)] + stopped)
+
+    result = {
+        "stop_rpm": round(stop_rpm),
+        "max_rpm": round(max_rpm),
+        "millivolts_for_max_rpm": round(max_rpm / k),
+        "samples": len(data),
+        "rms_rpm": error,
+    }
+    if stable_delay:
+        result["stable_delay"] = stable_delay
+    return result
+
+def segments(samples):
+    """Split timed samples into segments of constant input (PWM or voltage)."""
+    data = rows(samples, "time_ms", "rpm")
+    data = [s for s in data if s["pwm"] is not None or s["millivolts"] is not None]
+    data.sort(key = lambda s: s["time_ms"])
+    key = lambda s: s["pwm"] if s["pwm"] is not None else s["millivolts"]
+    result = []
+    for s in data:
+        # Ignore measurement noise: 2 % or 50 units.
+        if not result or abs(key(s) - key(result[-1][0])) > max(50, 0.02 * abs(key(s))):
+            result.append([])
+        result[-1].append(s)
+    return result
+
+def fit_stable_delay(samples, rpm_stable_threshold):
+    """Time from an input change until the RPM stays within the threshold."""
+    delays = []
+    for segment in segments(samples)[1:]:
+        if len(segment) < 6:
+            continue
+        final = median([s["rpm"] for s in segment[-3:]])
+        # Median of three samples filters out single noisy readings.
+        unstable = [
+            segment[i]["time_ms"] for i in range(1, len(segment) - 1)
+            if abs(median([s["rpm"] for s in segment[i - 1 : i + 2]]) - final) > rpm_stable_threshold
+        ]
+        if unstable and unstable[-1] < segment[-3]["time_ms"]:
+            delays.append(unstable[-1] - segment[0]["time_ms"])
+        elif not unstable:
+            delays.append(0)
+    if not delays:
+        return None
+    # Round up to whole seconds.
+    return max(1_000, int(-(-percentile(delays, 95) // 1_000) * 1_000))
+
+def fit_levels(samples, adc):
+    """Median voltage of each controller level, and thresholds between levels."""
+    data = rows(samples, "level")
+    levels = {}
+    for s in data:
+        mv = s["millivolts"]
+        if mv is None and s["adc"] is not None and adc:
+            mv = max(0, (s["adc"] - adc["offset"]) * adc["num"] // adc["den"])
+        if mv is not None:
+            levels.setdefault(int(s["level"]), []).append(mv)
+    if len(levels) < 2:
+        return None
+    levels_to_millivolts = [(level, round(median(mvs))) for level, mvs in sorted(levels.items())]
+    thresholds = [
+        ((mv0 + mv1) // 2, level0)
+        for (level0, mv0), (level1, mv1) in zip(levels_to_millivolts, levels_to_millivolts[1:])
+    ]
+    return {"levels_to_millivolts": levels_to_millivolts, "thresholds": thresholds, "samples": len(data)}
+
+def fan_code(name, fan):
+    return f"""from FanMonitor import FanMonitor
+
+class {name}(FanMonitor):
+    # Fitted with FitFanModel.py from {fan["samples"]} samples, RMS error {fan["rms_rpm"]:.0f} rpm.
+    stop_rpm = {fan["stop_rpm"]}
+    max_rpm = {fan["max_rpm"]}
+    millivolts_for_max_rpm = {fan["millivolts_for_max_rpm"]}
+    stable_delay = {fan.get("stable_delay", FAN_DEFAULTS["stable_delay"])}
+    rpm_stable_threshold = {fan["rpm_stable_threshold"]}
+    percentage_stable_threshold = 1
+"""
+
+def controller_code(name, unit, adc, levels):
+    code = f"""from ControllerMonitor import ControllerMonitor
+
+class {name}(ControllerMonitor):
+"""
+    if levels:
+        top = levels["levels_to_millivolts"][-1][0]
+        code += f"""    # Levels fitted with FitFanModel.py from {levels["samples"]} samples.
+    levels_to_millivolts = {tuple(levels["levels_to_millivolts"])}
+    unit = "{unit}"
+    # Highest millivolts for each level, except the last.
+    level_thresholds = {tuple(levels["thresholds"])}
+    def _calculate_level(self, mv):
+        for mv_max, level in self.level_thresholds:
+            if mv < mv_max:
+                return level
+        return {top}
+"""
+    if adc:
+        code += f"""
+    def _adc_to_millivolts(self, adc_u16):
+        # Fitted with FitFanModel.py from {adc["samples"]} samples, RMS error {adc["rms_mv"]:.0f} mV.
+        return max(0, (adc_u16 - {adc["offset"]}) * {adc["num"]} // {adc["den"]})
+"""
+    return code
+
+def main():
+    parser = argparse.ArgumentParser(description = "Fit FanMonitor and ControllerMonitor constants from samples.")
+    parser.add_argument("samples", help = "CSV file")
+    parser.add_argument("--fan", metavar = "NAME", help = "emit a FanMonitor subclass")
+    parser.add_argument("--controller", metavar = "NAME", help = "emit a ControllerMonitor subclass")
+    parser.add_argument("--unit", default = "%", help = "controller level unit")
+    parser.add_argument("--rpm-stable-threshold", type = int, default = FAN_DEFAULTS["rpm_stable_threshold"])
+    args = parser.parse_args()
+    if not args.fan and not args.controller:
+        parser.error("nothing to do: give --fan and/or --controller")
+
+    samples = read_samples(args.samples)
+    code = []
+    try:
+        if args.fan:
+            fan = fit_fan(samples, args.rpm_stable_threshold)
+            if not fan:
+                sys.exit("Not enough samples with millivolts and rpm.")
+            fan["rpm_stable_threshold"] = args.rpm_stable_threshold
+            code.append(fan_code(args.fan, fan))
+        if args.controller:
+            adc = fit_adc(samples)
+            levels = fit_levels(samples, adc)
+            if not adc and not levels:
+                sys.exit("Not enough samples with adc and millivolts, or level.")
+            code.append(controller_code(args.controller, args.unit, adc, levels))
+    except ValueError as e:
+        sys.exit(str(e))
+    print("\n".join(code), end = "")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+# Host-side collector for many HomeVentilationControl units (CPython 3.8+).
+#
+# Collect from devices:
+#   python3 FleetCollector.py --store data 192.168.1.10 192.168.1.11:38866
+# Load test with simulated devices:
+#   python3 FleetCollector.py --store /tmp/data --simulate 500 --duration 30
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import time
+from array import array
+
+UDP_DEFAULT_PORT = 38866
+# Devices forget peers after 910 seconds, so register well before that.
+REGISTER_INTERVAL = 60
+REGISTER_DATAGRAM = json.dumps({"HomeVentilationControl": {}}).encode()
+
+# Missing values (None) are stored as the smallest value of the type.
+NULL = {"b": -0x80, "h": -0x8000, "i": -0x8000_0000, "q": -0x8000_0000_0000_0000}
+
+def _fan_columns(i):
+    return (
+        (f"{i}_percentage", "h", (i, "percentage")),
+        (f"{i}_rpm", "h", (i, "rpm")),
+        (f"{i}_target_no_wifi", "h", (i, "target_no_wifi")),
+        (f"{i}_target", "h", (i, "target")),
+        (f"{i}_on", "b", (i, "on")),
+        (f"{i}_own", "b", (i, "own")),
+        (f"{i}_wifi_valid", "b", (i, "wifi", "valid")),
+        (f"{i}_level", "h", (i, "controller", "level")),
+        (f"{i}_millivolts", "h", (i, "controller", "millivolts")),
+    )
+
+# Column name, array typecode, path in the state.
+COLUMNS = (
+    ("time", "d", None),
+    ("device", "H", None),
+    ("uptime", "q", ("uptime",)),
+    ("temperature", "h", ("air", "temperature")),
+    ("rh", "h", ("air", "rh")),
+) + _fan_columns("0") + _fan_columns("1") + (
+    ("1_ir_speed", "b", ("1", "ir", "speed")),
+)
+
+class ColumnStore:
+    """Append-only columnar store: one file of fixed-size values per column.
+
+    Rows are buffered in memory and appended to the column files in batches.
+    Device unique_ids are stored once in devices.txt and referenced by index.
+    """
+
+    def __init__(self, path, flush_rows = 4096):
+        os.makedirs(path, exist_ok = True)
+        self.path = path
+        self.flush_rows = flush_rows
+        self.rows_written = 0
+        self.devices = self.read_devices(path)
+        self._device_index = {d: i for i, d in enumerate(self.devices)}
+        self._buffers = {name: array(typecode) for name, typecode, _ in COLUMNS}
+        self.truncate(path)
+
+    @staticmethod
+    def truncate(path):
+        """Cut the rows of an interrupted flush, so that new rows stay aligned."""
+        sizes = {}
+        for name, typecode, _ in COLUMNS:
+            try:
+                sizes[name] = (os.path.getsize(os.path.join(path, name + ".col")), array(typecode).itemsize)
+            except FileNotFoundError:
+                sizes[name] = (0, array(typecode).itemsize)
+        rows = min(size // itemsize for size, itemsize in sizes.values())
+        for name, (size, itemsize) in sizes.items():
+            if size != rows * itemsize:
+                with open(os.path.join(path, name + ".col"), "r+b") as f:
+                    f.truncate(rows * itemsize)
+
+    @staticmethod
+    def read_devices(path):
+        try:
+            with open(os.path.join(path, "devices.txt"), "r") as f:
+                return f.read().split()
+        except FileNotFoundError:
+            return []
+
+    def device_index(self, unique_id):
+        if unique_id not in self._device_index:
+            with open(os.path.join(self.path, "devices.txt"), "a") as f:
+                f.write(unique_id + "\n")
+            self._device_index[unique_id] = len(self.devices)
+            self.devices.append(unique_id)
+        return self._device_index[unique_id]
+
+    def append(self, t, unique_id, state):
+        # Convert all values first, so that a bad state doesn't leave a partial row.
+        row = []
+        for name, typecode, path in COLUMNS:
+            if name == "time":
+                value = t
+            elif name == "device":
+                value = self.device_index(unique_id)
+            else:
+                value = state
+                for key in path:
+                    value = value.get(key) if isinstance(value, dict) else None
+                value = NULL[typecode] if value is None else int(value)
+            # Check the range (OverflowError) before appending anything.
+            array(typecode, [value])
+            row.append(value)
+        for (name, _, _), value in zip(COLUMNS, row):
+            self._buffers[name].append(value)
+        if len(self._buffers["time"]) >= self.flush_rows:
+            self.flush()
+
+    def flush(self):
+        rows = len(self._buffers["time"])
+        if not rows:
+            return
+        for name, typecode, _ in COLUMNS:
+            with open(os.path.join(self.path, name + ".col"), "ab") as f:
+                self._buffers[name].tofile(f)
+            self._buffers[name] = array(typecode)
+        self.rows_written += rows
+
+    @staticmethod
+    def read(path):
+        """Read all columns. Rows from an interrupted flush are dropped."""
+        columns = {}
+        for name, typecode, _ in COLUMNS:
+            columns[name] = a = array(typecode)
+            try:
+                with open(os.path.join(path, name + ".col"), "rb") as f:
+                    data = f.read()
+                a.frombytes(data[:len(data) - len(data) % a.itemsize])
+            except FileNotFoundError:
+                pass
+        rows = min(len(a) for a in columns.values())
+        return {name: a[:rows] for name, a in columns.items()}
+
+class FleetCollector(asyncio.DatagramProtocol):
+    def __init__(self, store, devices):
+        self.store = store
+        self.devices = devices
+        self.transport = None
+        self.received = self.duplicates = self.invalid = 0
+        self._last_uptime = {}
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, source):
+        self.received += 1
+        try:
+            state = json.loads(data)["HomeVentilationControl"]
+            unique_id = state["unique_id"]
+            uptime = state["uptime"]
+        except (ValueError, KeyError, TypeError):
+            self.invalid += 1
+            return
+        # The same state may arrive more than once, e.g. if a device
+        # is listed with several addresses.
+        if self._last_uptime.get(unique_id) == uptime:
+            self.duplicates += 1
+            return
+        self._last_uptime[unique_id] = uptime
+        try:
+            self.store.append(time.time(), unique_id, state)
+        except (ValueError, TypeError, OverflowError):
+            self.invalid += 1
+
+    def register(self):
+        for device in self.devices:
+            self.transport.sendto(REGISTER_DATAGRAM, device)
+
+    async def run(self, flush_interval):
+        next_register = 0
+        while True:
+            if time.monotonic() >= next_register:
+                self.register()
+                next_register = time.monotonic() + REGISTER_INTERVAL
+            await asyncio.sleep(flush_interval)
+            self.store.flush()
+
+async def open_udp(loop, protocol_factory, host = "0.0.0.0", port = 0, rcvbuf = None):
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    if port:
+        # Not for ephemeral ports: they could be given out twice.
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if rcvbuf:
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+    s.bind((host, port))
+    s.setblocking(False)
+    return await loop.create_datagram_endpoint(protocol_factory, sock = s)
+
+class SimulatedDevice(asyncio.DatagramProtocol):
+    """Sends a state like HomeVentilationControl.state() to registered peers."""
+
+    def __init__(self, n):
+        self.unique_id = f"e66{n:013x}"
+        self.peers = set()
+        self.sent = 0
+        self.transport = None
+        self._started = time.monotonic()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, source):
+        try:
+            json.loads(data)["HomeVentilationControl"]
+        except (ValueError, KeyError, TypeError):
+            return
+        self.peers.add(source)
+
+    def state(self):
+        uptime = int(1000 * (time.monotonic() - self._started))
+        fan = lambda p: {
+            "percentage": p, "rpm": 30 * p, "target_no_wifi": p, "target": p, "on": 1, "own": 1,
+            "wifi": {"points": [[0, 0], [100, 100]], "valid": False, "age": None, "ttl": 0},
+            "controller": {"level": p, "unit": "%", "millivolts": 90 * p, "age": uptime, "measured_level": p},
+        }
+        state = {
+            "unique_id": self.unique_id,
+            "clock": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "uptime": uptime,
+            "conf": {"watchdog": True, "modify_cm0": [[0, 0], [100, 100]], "modify_cm1": [[0, 0], [5, 100]], "udp_port": "default"},
+            "air": {"temperature": 215, "rh": 400 + uptime // 1000 % 100},
+            "0": fan(uptime // 1000 % 100),
+            "1": fan(uptime // 3000 % 100),
+        }
+        state["1"]["ir"] = {"speed": 0, "expired_speed": None, "speed_age": None, "light": False, "light_age": None}
+        return state
+
+    def send_state(self):
+        data = json.dumps({"HomeVentilationControl": self.state()}).encode()
+        for peer in self.peers:
+            self.transport.sendto(data, peer)
+            self.sent += 1
+
+async def load_test(store, count, duration, interval, flush_interval):
+    loop = asyncio.get_running_loop()
+    devices = []
+    for n in range(count):
+        transport, device = await open_udp(loop, lambda n = n: SimulatedDevice(n), "127.0.0.1")
+        devices.append(device)
+    addresses = [d.transport.get_extra_info("sockname") for d in devices]
+    _, collector = await open_udp(loop, lambda: FleetCollector(store, addresses), "127.0.0.1", rcvbuf = 4 << 20)
+    task = asyncio.create_task(collector.run(flush_interval))
+
+    # Spread the devices evenly over the send interval.
+    started = time.monotonic()
+    tick = interval / count
+    n = 0
+    while time.monotonic() - started < duration:
+        devices[n % count].send_state()
+        n += 1
+        await asyncio.sleep(max(0, started + n * tick - time.monotonic()))
+    await asyncio.sleep(0.5)
+    task.cancel()
+    store.flush()
+
+    sent = sum(d.sent for d in devices)
+    elapsed = time.monotonic() - started
+    rows = len(ColumnStore.read(store.path)["time"])
+    print(f"devices:     {count}, registered {sum(1 for d in devices if d.peers)}")
+    print(f"sent:        {sent} ({sent / elapsed:.0f}/s)")
+    print(f"received:    {collector.received}, duplicates {collector.duplicates}, invalid {collector.invalid}")
+    print(f"stored:      {store.rows_written} rows this run, {rows} rows in store")
+    print(f"dropped:     {sent - collector.received} ({100 * (sent - collector.received) / max(1, sent):.2f} %)")
+
+def parse_address(text):
+    host, _, port = text.partition(":")
+    return (host, int(port or UDP_DEFAULT_PORT))
+
+def main():
+    parser = argparse.ArgumentParser(description = "Collect state from many HomeVentilationControl units.")
+    parser.add_argument("devices", nargs = "*", type = parse_address, help = "host[:port]")
+    parser.add_argument("--store", required = True, help = "directory for the column files")
+    parser.add_argument("--port", type = int, default = 0, help = "local UDP port")
+    parser.add_argument("--flush-interval", type = float, default = 10, help = "seconds between flushes")
+    parser.add_argument("--simulate", type = int, metavar = "N", help = "load test with N simulated devices")
+    parser.add_argument("--duration", type = float, default = 30, help = "load test duration (seconds)")
+    parser.add_argument("--interval", type = float, default = 1, help = "load test state interval per device (seconds)")
+    args = parser.parse_args()
+
+    store = ColumnStore(args.store)
+    if args.simulate:
+        asyncio.run(load_test(store, args.simulate, args.duration, args.interval, args.flush_interval))
+        return
+
+    async def collect():
+        loop = asyncio.get_running_loop()
+        _, collector = await open_udp(loop, lambda: FleetCollector(store, args.devices), port = args.port, rcvbuf = 4 << 20)
+        await collector.run(args.flush_interval)
+    try:
+        asyncio.run(collect())
+    finally:
+        store.flush()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+# Load test for the UDP and HTTP interfaces of a HomeVentilationControl unit (CPython 3.8+).
+#
+#   python3 LoadTest.py 192.168.1.10 --peers 1,5,20,50 --rates 1,10,50
+#
+# Each step registers the given number of UDP peers, sends commands at the
+# given total rate, and polls the state over HTTP. The device reports its own
+# processing times in state()["loop"], so the results show where the control
+# loop starts to lag behind.
+#
+# A real command re-posts the current Wi-Fi mapping of a fan with its remaining
+# TTL, so the fans keep running as before, but the device updates and sends
+# its state to all peers. A no-op command only carries the unique_id.
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+UDP_DEFAULT_PORT = 38866
+NOMINAL_UPDATE_INTERVAL = 200
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, len(values) * p // 100)]
+
+def fmt(value):
+    return "-" if value is None else f"{value:.0f}" if isinstance(value, float) else str(value)
+
+class Peer(asyncio.DatagramProtocol):
+    def __init__(self, test):
+        self.test = test
+        self.transport = None
+        self.received = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, source):
+        try:
+            state = json.loads(data)["HomeVentilationControl"]
+        except (ValueError, KeyError, TypeError):
+            return
+        self.received += 1
+        self.test.record(state)
+
+    def send(self, post):
+        self.transport.sendto(json.dumps({"HomeVentilationControl": post}).encode(), self.test.udp_address)
+
+class LoadTest:
+    def __init__(self, host, udp_port, http_port, http_path, timeout):
+        self.host = host
+        self.udp_address = (host, udp_port)
+        self.http_port = http_port
+        self.http_path = http_path
+        self.timeout = timeout
+        self.unique_id = None
+        # Current Wi-Fi mapping of each fan: (points, TTL deadline or None).
+        self.wifi = {}
+        self.peers = []
+        self._reset_step()
+
+    def _reset_step(self):
+        self.loop_samples = []
+        self.broadcasts = {}
+        self.http_ok = self.http_errors = 0
+        self.http_latency = []
+
+    def seen(self, state):
+        self.unique_id = state.get("unique_id", self.unique_id)
+        now = time.monotonic()
+        for fan in ("0", "1"):
+            try:
+                wifi = state[fan]["wifi"]
+                deadline = now + (wifi["ttl"] - wifi["age"]) / 1000 if wifi["valid"] else None
+                self.wifi[fan] = (wifi["points"], deadline)
+            except (KeyError, TypeError):
+                pass
+
+    def command(self, real):
+        post = {"unique_id": self.unique_id} if self.unique_id else {}
+        if real and self.wifi:
+            fan = random.choice(list(self.wifi))
+            points, deadline = self.wifi[fan]
+            # TTL 0 keeps an expired mapping expired.
+            ttl = max(0, int(1000 * (deadline - time.monotonic()))) if deadline else 0
+            post[f"wifi_{fan}"] = points
+            post[f"wifi_{fan}_ttl"] = ttl
+        return post
+
+    def record(self, state):
+        self.seen(state)
+        loop = state.get("loop")
+        if loop:
+            self.loop_samples.append(loop)
+        # Count the copies of each broadcast, identified by uptime,
+        # and the number of peers it was sent to.
+        key = state.get("uptime")
+        copies, _ = self.broadcasts.get(key, (0, 0))
+        self.broadcasts[key] = (copies + 1, loop["udp_peers"] if loop else 1)
+
+    async def http(self, method, query, body = b""):
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.http_port), self.timeout)
+        try:
+            writer.write((
+                f"{method} {self.http_path}{query} HTTP/1.0\r\n"
+                f"Host: {self.host}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n"
+            ).encode() + body)
+            data = await asyncio.wait_for(reader.read(), self.timeout)
+        finally:
+            writer.close()
+        head, _, content = data.partition(b"\r\n\r\n")
+        return int(head.split(b" ", 2)[1]), content
+
+    async def http_sample(self):
+        # Mix reading the state and posting a no-op command.
+        t = time.monotonic()
+        try:
+            if random.random() < 0.5:
+                status, content = await self.http("GET", "?json")
+                if status == 200:
+                    state = json.loads(content)
+                    self.seen(state)
+                    self.loop_samples.append(state["loop"])
+            else:
+                status, _ = await self.http("POST", "?json-post", b"{}")
+        except (OSError, asyncio.TimeoutError, ValueError, KeyError, IndexError):
+            status = None
+        if status == 200:
+            self.http_ok += 1
+            self.http_latency.append(1000 * (time.monotonic() - t))
+        else:
+            self.http_errors += 1
+
+    async def read_loop(self):
+        try:
+            status, content = await self.http("GET", "?json")
+            state = json.loads(content)
+            self.seen(state)
+            return state["loop"]
+        except (OSError, asyncio.TimeoutError, ValueError, KeyError, IndexError):
+            return None
+
+    async def add_peers(self, count):
+        loop = asyncio.get_running_loop()
+        while len(self.peers) < count:
+            _, peer = await loop.create_datagram_endpoint(lambda: Peer(self), local_addr = ("0.0.0.0", 0))
+            self.peers.append(peer)
+
+    async def step(self, peer_count, command_rate, real_commands, http_rate, duration):
+        await self.add_peers(peer_count)
+        self._reset_step()
+        peers = self.peers[:peer_count]
+        received_0 = sum(p.received for p in peers)
+        loop_0 = await self.read_loop()
+        sent = real = 0
+        # Register (or refresh) all peers, paced like commands.
+        for peer in peers:
+            peer.send({})
+            await asyncio.sleep(1 / max(command_rate, 1))
+        sent += len(peers)
+
+        http_tasks = []
+        started = time.monotonic()
+        next_command = next_http = started
+        while (now := time.monotonic()) - started < duration:
+            if command_rate and now >= next_command:
+                post = self.command(random.random() * 100 < real_commands)
+                random.choice(peers).send(post)
+                sent += 1
+                real += any(k.startswith("wifi_") for k in post)
+                next_command += 1 / command_rate
+            if http_rate and now >= next_http:
+                http_tasks.append(asyncio.create_task(self.http_sample()))
+                next_http += 1 / http_rate
+            await asyncio.sleep(max(0, min(next_command if command_rate else now + 1, next_http if http_rate else now + 1) - time.monotonic()))
+        await asyncio.sleep(1)
+        await asyncio.gather(*http_tasks)
+        loop_1 = await self.read_loop()
+
+        samples = self.loop_samples
+        processed = None
+        if loop_0 and loop_1:
+            processed = 100 * (loop_1["udp_received"] - loop_0["udp_received"]) / max(1, sent)
+        copies = sum(copies for copies, _ in self.broadcasts.values())
+        expected = sum(peers for _, peers in self.broadcasts.values())
+        intervals = [s["update_interval"] for s in samples if s["update_interval"] is not None]
+        return {
+            "peers": peer_count,
+            "cmd/s": command_rate,
+            "sent": sent,
+            "real": real,
+            "processed %": processed,
+            "broadcasts": len(self.broadcasts),
+            "delivered %": 100 * copies / max(1, expected) if self.broadcasts else None,
+            "states": sum(p.received for p in peers) - received_0,
+            "update us p50": percentile([s["update_us"] for s in samples], 50),
+            "udp us p50": percentile([s["udp_us"] for s in samples], 50),
+            "udp us max": max((s["udp_us"] for s in samples), default = None),
+            "interval p95": percentile(intervals, 95),
+            "interval max": max(intervals, default = None),
+            "alloc max": max((s.get("update_alloc") or 0 for s in samples), default = None),
+            "http ok": self.http_ok,
+            "http err": self.http_errors,
+            "http ms p95": percentile(self.http_latency, 95),
+        }
+
+def print_table(rows):
+    keys = list(rows[0])
+    widths = [max(len(k), *(len(fmt(r[k])) for r in rows)) for k in keys]
+    print("  ".join(k.rjust(w) for k, w in zip(keys, widths)))
+    for r in rows:
+        print("  ".join(fmt(r[k]).rjust(w) for k, w in zip(keys, widths)))
+
+def degraded(row, max_interval, min_processed):
+    return (
+        (row["interval p95"] or 0) > max_interval or
+        (row["processed %"] is not None and row["processed %"] < min_processed) or
+        row["http err"] > 0
+    )
+
+async def run(args):
+    test = LoadTest(args.host, args.udp_port, args.http_port, args.http_path, args.timeout)
+    rows = []
+    for peer_count in args.peers:
+        for rate in args.rates:
+            row = await test.step(peer_count, rate, args.real_commands, args.http_rate, args.duration)
+            rows.append(row)
+            print(f"peers {peer_count}, {rate} cmd/s: processed {fmt(row['processed %'])} %, interval p95 {fmt(row['interval p95'])} ms", flush = True)
+    print()
+    print_table(rows)
+    print()
+    for row in rows:
+        if degraded(row, args.max_interval, args.min_processed):
+            print(f"Degraded at {row['peers']} peers and {row['cmd/s']} commands/s.")
+            break
+    else:
+        print("No degradation detected.")
+
+def int_list(text):
+    return [int(x) for x in text.split(",")]
+
+def main():
+    parser = argparse.ArgumentParser(description = "Load test the UDP and HTTP interfaces of a HomeVentilationControl unit.")
+    parser.add_argument("host")
+    parser.add_argument("--udp-port", type = int, default = UDP_DEFAULT_PORT)
+    parser.add_argument("--http-port", type = int, default = 80)
+    parser.add_argument("--http-path", default = "/", help = "path of the HomeVentilationControl module")
+    parser.add_argument("--peers", type = int_list, default = [1, 5, 20, 50], help = "comma-separated peer counts")
+    parser.add_argument("--rates", type = int_list, default = [1, 10, 50], help = "comma-separated UDP command rates (per second)")
+    parser.add_argument("--real-commands", type = float, default = 50, help = "share of real commands, the rest are no-ops (%%)")
+    parser.add_argument("--http-rate", type = float, default = 1, help = "HTTP requests per second")
+    parser.add_argument("--duration", type = float, default = 20, help = "seconds per step")
+    parser.add_argument("--timeout", type = float, default = 5, help = "HTTP timeout (seconds)")
+    parser.add_argument("--max-interval", type = int, default = 2 * NOMINAL_UPDATE_INTERVAL, help = "acceptable update interval p95 (ms)")
+    parser.add_argument("--min-processed", type = float, default = 99, help = "acceptable share of processed commands (%%)")
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()